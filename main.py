@@ -1,83 +1,174 @@
+from contextlib import asynccontextmanager
 from typing import Any
 
-import requests
+import httpx
+import numpy as np
 from fastapi import FastAPI, HTTPException, Query
-from haversine import haversine
 
 from utils import (
     MAX_ALLOWED_DISTANCE_KM,
+    OPERATOR_CODES,
+    OPERATOR_ID_BY_CODE,
     OPERATOR_NAME_BY_CODE,
-    SATISFACTORY_DISTANCE_KM,
+    coverage_byte_to_dict,
+    equirectangular_km,
+    grid_cell,
     load_operator_to_network_coverage_cache,
+    site_distances_km,
 )
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Parse the coverage cache once per process instead of per request
+    app.state.network_coverage_by_operator = load_operator_to_network_coverage_cache()
+    # Shared client so outbound geocoding calls reuse kept-alive connections
+    app.state.http = httpx.AsyncClient(
+        limits=httpx.Limits(max_keepalive_connections=20)
+    )
+    yield
+    await app.state.http.aclose()
+
+
 app = FastAPI(
     title="Mobile Network Coverage API",
     description="API to query mobile network coverage by operator and technology (2G/3G/4G) for a given address using French government open data.",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
+# In-process caches of geocoding results: the same addresses come back often
+# (retries, autocomplete, tests) and each upstream call costs a ~100 ms round
+# trip. Evicted FIFO once full; functools.lru_cache cannot wrap coroutines.
+GEOCODE_CACHE_MAX_SIZE = 10_000
+_geocode_cache: dict[str, tuple[float, float] | None] = {}
+_reverse_geocode_cache: dict[tuple[float, float], dict[str, Any] | None] = {}
+
+
+def _cache_result(cache: dict, key, result):
+    if len(cache) >= GEOCODE_CACHE_MAX_SIZE:
+        cache.pop(next(iter(cache)))
+    cache[key] = result
+    return result
+
+
+async def _geocode(addr: str) -> tuple[float, float] | None:
+    """(longitude, latitude) of the address, or None if it does not resolve."""
+    if addr in _geocode_cache:
+        return _geocode_cache[addr]
+
+    resp = await app.state.http.get(f"https://api-adresse.data.gouv.fr/search/?q={addr}")
+    resp.raise_for_status()
+
+    features = resp.json().get("features")
+    if not features:
+        return _cache_result(_geocode_cache, addr, None)
+
+    coords = features[0]["geometry"]["coordinates"]  # [longitude, latitude]
+    return _cache_result(_geocode_cache, addr, (coords[0], coords[1]))
+
+
+async def _reverse_geocode(lon: float, lat: float) -> dict[str, Any] | None:
+    """Address properties of the best fit for the coordinates, or None."""
+    if (lon, lat) in _reverse_geocode_cache:
+        return _reverse_geocode_cache[(lon, lat)]
+
+    resp = await app.state.http.get(
+        f"https://api-adresse.data.gouv.fr/reverse/?lon={lon}&lat={lat}"
+    )
+    resp.raise_for_status()
+
+    features = resp.json().get("features")
+    if not features:
+        return _cache_result(_reverse_geocode_cache, (lon, lat), None)
+
+    return _cache_result(
+        _reverse_geocode_cache, (lon, lat), features[0]["properties"]
+    )
+
 
 @app.get(
     "/network_coverage",
     summary="Get network coverage (2G/3G/4G) by operator for a given address",
     description="Returns the closest coverage sites of each operator for the given address.",
 )
-def get_network_coverage(
+async def get_network_coverage(
     addr: str = Query(
         ...,
         description="Address to search network coverage for (e.g. 'Av. Gustave Eiffel, 75007 Paris, France')",
     ),
 ):
-    resp = requests.get(f"https://api-adresse.data.gouv.fr/search/?q={addr}")
-    resp.raise_for_status()
-
-    features = resp.json().get("features")
-    if not features:
+    coords = await _geocode(addr)
+    if coords is None:
         raise HTTPException(status_code=404, detail="Address not found.")
 
-    coords: tuple[float, float] = features[0]["geometry"][
-        "coordinates"
-    ]  # [longitude, latitude]
-    api_lon, api_lat = coords[0], coords[1]
-
-    operator_best: dict[str, dict] = {}
-    for operator_code, entries in load_operator_to_network_coverage_cache().items():
-        try:
-            operator_name = OPERATOR_NAME_BY_CODE[int(operator_code)]
-        except ValueError:
-            raise ValueError(
-                f"Operator code should be an int or numeric string in CSV, we were given: {operator_code}."
-            )
-        except KeyError:
-            raise KeyError(
-                f"Unknown operator code in CSV: {operator_code}, it should belong to {OPERATOR_NAME_BY_CODE.keys()}."
+    api_lon, api_lat = coords
+
+    api_x, api_y = equirectangular_km(api_lat, api_lon)
+
+    # Per-operator best tracked in preallocated arrays indexed by operator id,
+    # the response dict is only built once at the end
+    best_distance = np.full(len(OPERATOR_CODES), np.inf)
+    best_site = np.full(len(OPERATOR_CODES), -1, dtype=np.int64)
+    best_arrays: list = [None] * len(OPERATOR_CODES)
+
+    for operator_code, arrays in app.state.network_coverage_by_operator.items():
+        # Codes were validated at cache build, the id lookup cannot fail
+        operator_id = OPERATOR_ID_BY_CODE[operator_code]
+
+        # Cheap bounding-box rejection before touching the grid
+        lat_min, lat_max, lon_min, lon_max = arrays["bbox"]
+        if not (lat_min <= api_lat <= lat_max and lon_min <= api_lon <= lon_max):
+            continue
+
+        # Gather candidate sites from the 3x3 grid cells around the query
+        cell_x, cell_y = grid_cell(api_x, api_y)
+        cell_indices = [
+            arrays["grid"][cell]
+            for cell in (
+                (cell_x + dx, cell_y + dy)
+                for dx in (-1, 0, 1)
+                for dy in (-1, 0, 1)
             )
+            if cell in arrays["grid"]
+        ]
+        if not cell_indices:
+            continue  # No site within MAX_ALLOWED_DISTANCE_KM
+
+        # Exact distances on the candidate batch only
+        candidates = np.concatenate(cell_indices)
+        distances = site_distances_km(
+            api_lat,
+            api_lon,
+            arrays["lat_rad"][candidates],
+            arrays["lon_rad"][candidates],
+            arrays["cos_lat"][candidates],
+        )
+        best = int(np.argmin(distances))
+        closest_distance = float(distances[best])
+        if closest_distance > MAX_ALLOWED_DISTANCE_KM:
+            continue
 
-        for entry in entries:
-            entry_coords: dict[str, float] = entry["csv_coords_gps"]
-            distance = haversine(
-                (api_lat, api_lon), (entry_coords["lat"], entry_coords["lon"])
-            )
-            if distance > MAX_ALLOWED_DISTANCE_KM:
-                continue
-
-            if operator_name in operator_best:
-                if distance < operator_best[operator_name]["distance_km"] > distance:
-                    operator_best[operator_name] = {
-                        "distance_km": distance,
-                        "csv_coords_gps": entry["csv_coords_gps"],
-                        "coverage": entry["coverage"],
-                    }
-            else:
-                operator_best[operator_name] = {
-                    "distance_km": distance,
-                    "csv_coords_gps": entry["csv_coords_gps"],
-                    "coverage": entry["coverage"],
-                }
-
-            if distance <= SATISFACTORY_DISTANCE_KM:
-                break  # Found a good enough distance, move to next operator
+        if closest_distance < best_distance[operator_id]:
+            best_distance[operator_id] = closest_distance
+            best_site[operator_id] = int(candidates[best])
+            best_arrays[operator_id] = arrays
+
+    operator_best: dict[str, dict] = {}
+    for operator_id, operator_code in enumerate(OPERATOR_CODES):
+        closest_idx = int(best_site[operator_id])
+        if closest_idx < 0:
+            continue
+
+        arrays = best_arrays[operator_id]
+        operator_best[OPERATOR_NAME_BY_CODE[operator_code]] = {
+            "distance_km": float(best_distance[operator_id]),
+            "csv_coords_gps": {
+                "lon": float(arrays["lon"][closest_idx]),
+                "lat": float(arrays["lat"][closest_idx]),
+            },
+            "coverage": coverage_byte_to_dict(arrays["coverage"][closest_idx]),
+        }
 
     if not operator_best:
         raise HTTPException(
@@ -94,24 +185,16 @@ def get_network_coverage(
     description="Returns address information for given longitude and latitude. "
     "Useful for checking the best coordinate fits from the coverage endpoint.",
 )
-def get_address_from_wsg84(
+async def get_address_from_wsg84(
     lon: float = Query(..., description="Longitude in decimal degrees (WGS 84)"),
     lat: float = Query(..., description="Latitude in decimal degrees (WGS 84)"),
 ):
-    resp = requests.get(
-        f"https://api-adresse.data.gouv.fr/reverse/?lon={lon}&lat={lat}"
-    )
-    resp.raise_for_status()
-
-    features = resp.json().get("features")
-    if not features:
+    properties = await _reverse_geocode(lon, lat)
+    if properties is None:
         raise HTTPException(
             status_code=404, detail="No address found for these coordinates."
         )
 
-    # Get properties from the best fit
-    properties: dict[str, Any] = features[0]["properties"]
-
     # Return selected fields if available
     return {
         k: properties.get(k)
@@ -1,7 +1,7 @@
 import os
 import sys
 
-import requests
+import pytest
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
@@ -9,32 +9,153 @@ from fastapi.testclient import TestClient
 
 from main import app
 
-client = TestClient(app)
 
+@pytest.fixture
+def client():
+    # Context manager so that the lifespan hook loads the coverage cache
+    with TestClient(app) as client:
+        yield client
+
+
+def mock_http_client(monkeypatch, payload: dict):
+    """Replace the shared httpx client with one returning a fixed payload."""
 
-def test_network_coverage_not_found(monkeypatch):
     class MockResponse:
         def raise_for_status(self):
             pass
 
         def json(self):
-            return {"features": []}
+            return payload
+
+    class MockAsyncClient:
+        def __init__(self):
+            self.calls = 0
+
+        async def get(self, *args, **kwargs):
+            self.calls += 1
+            return MockResponse()
 
-    monkeypatch.setattr(requests, "get", lambda *a, **kw: MockResponse())
+    mock = MockAsyncClient()
+    monkeypatch.setattr(app.state, "http", mock)
+    return mock
+
+
+def test_network_coverage_not_found(client, monkeypatch):
+    mock_http_client(monkeypatch, {"features": []})
     response = client.get("/network_coverage?addr=InvalidAddress")
     assert response.status_code == 404
     assert response.json()["detail"] == "Address not found."
 
 
-def test_address_from_wsg84_not_found(monkeypatch):
-    class MockResponse:
-        def raise_for_status(self):
-            pass
+def test_network_coverage_out_of_range(client, monkeypatch):
+    # Saint-Denis, La Réunion: geocodes fine, far outside the metropolitan
+    # sites covered by the CSV
+    mock_http_client(
+        monkeypatch,
+        {"features": [{"geometry": {"coordinates": [55.4504, -20.8789]}}]},
+    )
+    response = client.get("/network_coverage?addr=Saint-Denis")
+    assert response.status_code == 404
+    assert "No coverage data found" in response.json()["detail"]
+
+
+def test_network_coverage_returns_nearest_site(client, monkeypatch):
+    import numpy as np
+
+    import utils
+
+    # Geocode to central Paris
+    mock_http_client(
+        monkeypatch,
+        {"features": [{"geometry": {"coordinates": [2.3522, 48.8566]}}]},
+    )
+
+    # Two Orange sites: one ~10 km north, one ~400 m away, farthest first so
+    # ordering matters for the nearest-site selection
+    lat = np.array([48.95, 48.86])
+    lon = np.array([2.3522, 2.3522])
+    lat_rad = np.radians(lat)
+    coverage = utils._group_by_operator(
+        np.array([20801, 20801], dtype=np.uint32),
+        {
+            "lat": lat,
+            "lon": lon,
+            "lat_rad": lat_rad.astype(np.float32),
+            "lon_rad": np.radians(lon).astype(np.float32),
+            "cos_lat": np.cos(lat_rad).astype(np.float32),
+            "coverage": np.array([7, 1], dtype=np.uint8),
+        },
+    )
+    monkeypatch.setattr(app.state, "network_coverage_by_operator", coverage)
+
+    response = client.get("/network_coverage?addr=Paris")
+    assert response.status_code == 200
+
+    body = response.json()
+    assert set(body) == {"Orange"}
+    assert body["Orange"]["distance_km"] < 1
+    assert body["Orange"]["csv_coords_gps"]["lat"] == pytest.approx(48.86)
+    assert body["Orange"]["coverage"] == {"2G": True, "3G": False, "4G": False}
+
+
+def test_geocode_results_are_cached(client, monkeypatch):
+    mock = mock_http_client(
+        monkeypatch,
+        {"features": [{"geometry": {"coordinates": [2.2945, 48.8584]}}]},
+    )
+
+    for _ in range(2):
+        response = client.get("/network_coverage?addr=Av.+Gustave+Eiffel+Paris")
+        assert response.status_code == 200
+
+    # The second request must be served from the geocode cache
+    assert mock.calls == 1
+
+
+def test_network_coverage_near_cap_at_high_latitude(client, monkeypatch):
+    import math
+
+    import numpy as np
+
+    import utils
+
+    # A site ~19.9 km due east of a query at Dunkirk latitude: the projection
+    # stretches east-west distances by ~1.1 up there, which used to push the
+    # site out of the 3x3 grid neighborhood despite being within the cap
+    query_lat, query_lon = 51.05, 2.35
+    site_lat = query_lat
+    site_lon = query_lon + 19.9 / (
+        utils.KM_PER_DEGREE * math.cos(math.radians(query_lat))
+    )
+
+    mock_http_client(
+        monkeypatch,
+        {"features": [{"geometry": {"coordinates": [query_lon, query_lat]}}]},
+    )
+
+    lat = np.array([site_lat])
+    lon = np.array([site_lon])
+    lat_rad = np.radians(lat)
+    coverage = utils._group_by_operator(
+        np.array([20801], dtype=np.uint32),
+        {
+            "lat": lat,
+            "lon": lon,
+            "lat_rad": lat_rad.astype(np.float32),
+            "lon_rad": np.radians(lon).astype(np.float32),
+            "cos_lat": np.cos(lat_rad).astype(np.float32),
+            "coverage": np.array([7], dtype=np.uint8),
+        },
+    )
+    monkeypatch.setattr(app.state, "network_coverage_by_operator", coverage)
+
+    response = client.get("/network_coverage?addr=Dunkerque")
+    assert response.status_code == 200
+    assert response.json()["Orange"]["distance_km"] == pytest.approx(19.9, abs=0.05)
 
-        def json(self):
-            return {"features": []}
 
-    monkeypatch.setattr(requests, "get", lambda *a, **kw: MockResponse())
+def test_address_from_wsg84_not_found(client, monkeypatch):
+    mock_http_client(monkeypatch, {"features": []})
     response = client.get("/address_from_wsg84?lon=0&lat=0")
     assert response.status_code == 404
     assert response.json()["detail"] == "No address found for these coordinates."
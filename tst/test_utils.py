@@ -1,43 +1,95 @@
+import numpy as np
+import pytest
+
 import utils
 
 
+def test_haversine_km():
+    # Paris <-> Marseille, roughly 660 km apart
+    distance = utils.haversine_km(48.8566, 2.3522, 43.2965, 5.3698)
+    assert 655 < distance < 665
+
+    # Vectorized over arrays of points
+    distances = utils.haversine_km(
+        48.8566,
+        2.3522,
+        np.array([48.8566, 43.2965]),
+        np.array([2.3522, 5.3698]),
+    )
+    assert distances.shape == (2,)
+    assert distances[0] == 0.0
+    assert 655 < distances[1] < 665
+
+
+def test_site_distances_km():
+    # Precomputed-trig kernel must agree with the plain haversine kernel
+    site_lat = np.array([43.2965, 48.8566])
+    site_lon = np.array([5.3698, 2.3522])
+
+    distances = utils.site_distances_km(
+        48.8566,
+        2.3522,
+        np.radians(site_lat).astype(np.float32),
+        np.radians(site_lon).astype(np.float32),
+        np.cos(np.radians(site_lat)).astype(np.float32),
+    )
+
+    # Single precision is within ~1 m of the float64 kernel at France scale
+    expected = utils.haversine_km(48.8566, 2.3522, site_lat, site_lon)
+    assert distances.dtype == np.float32
+    assert distances == pytest.approx(expected, abs=1e-3)
+
+
 def test_lambert93_to_wsg84():
     lon, lat = 102980, 6847973
     res = utils.lambert93_to_wsg84(lon, lat)
 
     assert isinstance(res, tuple)
-    assert res == (-5.0888561153013425, 48.456574558829914)  # Known conversion
+    # Known conversion, up to PROJ rounding in the last digits
+    assert res == pytest.approx((-5.0888561153013425, 48.456574558829914))
 
 
 def test_load_operator_coverage_cache(monkeypatch, tmp_path):
-    # Patch paths and pandas.read_csv to avoid file IO
-    import pandas as pd
-
-    dummy_row: dict[str, str] = {
-        "Operateur": "20801",
-        "x": "102980",
-        "y": "6847973",
-        "2G": "1",
-        "3G": "1",
-        "4G": "0",
-    }
+    # Point paths to a temporary CSV with a single site row
+    dummy_csv = tmp_path / "dummy.csv"
+    dummy_csv.write_text(
+        "Operateur;x;y;2G;3G;4G\n"
+        "20801;102980;6847973;1;1;0\n"
+        "99999;102980;6847973;1;1;1\n",  # Unknown code, dropped at build
+        encoding="utf-8",
+    )
 
-    monkeypatch.setattr(utils, "CSV_PATH", "dummy.csv")
-    monkeypatch.setattr(utils, "CACHE_FILE_PATH", str(tmp_path / "cache.json"))
-    monkeypatch.setattr(pd, "read_csv", lambda fp, **kw: pd.DataFrame([dummy_row]))
+    monkeypatch.setattr(utils, "CSV_PATH", str(dummy_csv))
+    monkeypatch.setattr(utils, "CACHE_DIR_PATH", str(tmp_path / "cache"))
+    monkeypatch.setattr(utils, "_network_coverage_by_operator", None)
 
     network_coverage_by_operator = utils.load_operator_to_network_coverage_cache()
-    assert "20801" in network_coverage_by_operator
-    assert isinstance(network_coverage_by_operator["20801"], list)
-    assert len(network_coverage_by_operator["20801"]) == 1
+    assert 20801 in network_coverage_by_operator
+    assert 99999 not in network_coverage_by_operator
 
-    first_entry = network_coverage_by_operator["20801"][0]
+    arrays = network_coverage_by_operator[20801]
+    assert arrays["lat"].shape == arrays["lon"].shape == (1,)
+    assert arrays["lat"].dtype == arrays["lon"].dtype == np.float64
 
-    network_coverage = first_entry["coverage"]
-    assert network_coverage["2G"] is True
-    assert network_coverage["3G"] is True
-    assert network_coverage["4G"] is False
+    expected_lon, expected_lat = utils.lambert93_to_wsg84(102980, 6847973)
+    assert arrays["lon"][0] == expected_lon
+    assert arrays["lat"][0] == expected_lat
+
+    # Trig columns are precomputed from the converted coordinates
+    assert arrays["lat_rad"][0] == pytest.approx(np.radians(expected_lat))
+    assert arrays["lon_rad"][0] == pytest.approx(np.radians(expected_lon))
+    assert arrays["cos_lat"][0] == pytest.approx(np.cos(np.radians(expected_lat)))
+
+    # 2G and 3G bits set, 4G bit unset
+    assert arrays["coverage"].tolist() == [3]
+    assert utils.coverage_byte_to_dict(arrays["coverage"][0]) == {
+        "2G": True,
+        "3G": True,
+        "4G": False,
+    }
 
-    lambert93_coords = first_entry["csv_coords_lambert93"]
-    assert lambert93_coords["lon"] == 102980
-    assert lambert93_coords["lat"] == 6847973
+    # Loading again should hit the memory-mapped .npy files
+    monkeypatch.setattr(utils, "_network_coverage_by_operator", None)
+    reloaded = utils.load_operator_to_network_coverage_cache()
+    assert reloaded[20801]["lat"].tolist() == arrays["lat"].tolist()
+    assert reloaded[20801]["coverage"].tolist() == arrays["coverage"].tolist()
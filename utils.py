@@ -1,11 +1,20 @@
-import json
+import csv
+import logging
 import math
 import os
 from collections import defaultdict
+from typing import Any
 
-import pandas as pd
+import numpy as np
 from pyproj import Transformer
 
+logger = logging.getLogger(__name__)
+
+# Cache structure: int operator code to its column arrays (lat, lon, trig
+# columns, coverage) plus the `grid` dict and `bbox` tuple attached by
+# _with_site_lookups
+NetworkCoverageByOperator = dict[int, dict[str, Any]]
+
 # Location of CSV file mapping operator and coordinates to network coverage
 CSV_PATH = os.path.join(
     "resources", "2018_01_Sites_mobiles_2G_3G_4G_France_metropolitaine_L93.csv"
@@ -21,61 +30,332 @@ OPERATOR_NAME_BY_CODE: dict[int, str] = {
 }
 ALL_KNOWN_OPERATOR: set[str] = set(OPERATOR_NAME_BY_CODE.values())
 
+# Dense operator ids (0..3) in declaration order, to index per-operator arrays
+OPERATOR_CODES: tuple[int, ...] = tuple(OPERATOR_NAME_BY_CODE)
+OPERATOR_ID_BY_CODE: dict[int, int] = {
+    operator_code: operator_id for operator_id, operator_code in enumerate(OPERATOR_CODES)
+}
+
 # Coverage area limits
 MAX_ALLOWED_DISTANCE_KM = 20.0  # over this distance, we ignore coverage
 SATISFACTORY_DISTANCE_KM = 5.0  # "big" city radius, coverage is good enough
 
-# --- CSV cache for operator code to list of coverage dicts ---
-CACHE_FILE_PATH = os.path.join("cache", "operator_coverage_cache.json")
+# Mean earth radius, same value as the `haversine` package
+EARTH_RADIUS_KM = 6371.0088
+
+# Bit of each technology in the packed coverage byte stored per site
+COVERAGE_BIT_BY_TECHNOLOGY: dict[str, int] = {"2G": 1, "3G": 2, "4G": 4}
+
+# Reference latitude of the local equirectangular projection, at the center of
+# metropolitan France (same as the Lambert 93 latitude of origin)
+EQUIRECTANGULAR_REF_LAT = 46.5
+
+# Length of one degree of latitude (or of longitude at the equator)
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+# Side of the square cells sites are hashed into on the equirectangular plane.
+# The projection stretches east-west distances by cos(ref_lat)/cos(lat) north
+# of the reference latitude, so a site within the allowed radius can project
+# up to that factor farther away. Sizing cells for the worst stretch at the
+# northernmost French latitude (~51.1, rounded up) keeps the guarantee that
+# the 3x3 block of cells around the query point contains every site within
+# MAX_ALLOWED_DISTANCE_KM.
+GRID_CELL_KM = (
+    MAX_ALLOWED_DISTANCE_KM
+    * math.cos(math.radians(EQUIRECTANGULAR_REF_LAT))
+    / math.cos(math.radians(51.5))
+)
+
+# --- CSV cache for operator code to arrays of coordinates and coverage ---
+# One .npy file per column, memory-mapped read-only at load so multiple
+# uvicorn workers share a single OS page cache copy of the arrays
+CACHE_DIR_PATH = "cache"
+
+# Built once at import: constructing a Transformer initializes a PROJ context,
+# which is far too expensive to repeat for every coordinate pair
+_L93_TO_WGS84 = Transformer.from_crs("EPSG:2154", "EPSG:4326", always_xy=True)
 
 
 def lambert93_to_wsg84(lon: float, lat: float):
     """
     Convert Lambert 93 (EPSG:2154) coordinates to WGS84 (longitude, latitude).
+
+    Also accepts NumPy arrays, converting whole columns in one call.
     """
-    lambert = "+proj=lcc +lat_1=49 +lat_2=44 +lat_0=46.5 +lon_0=3 +x_0=700000 +y_0=6600000 +ellps=GRS80 +towgs84=0,0,0,0,0,0,0 +units=m +no_defs"
-    wsg84 = "+proj=longlat +ellps=WGS84 +datum=WGS84 +no_defs"
+    return _L93_TO_WGS84.transform(lon, lat)
 
-    return Transformer.from_crs(lambert, wsg84).transform(lon, lat)
 
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance in kilometers between (lat1, lon1) and (lat2, lon2).
 
-def load_operator_to_network_coverage_cache():
-    # Try loading existing cache file first
-    if os.path.exists(CACHE_FILE_PATH):
-        with open(CACHE_FILE_PATH, "r", encoding="utf-8") as f:
-            return json.load(f)
+    Accepts NumPy arrays as well as scalars, so distances from one point to
+    every site of an operator are computed in a single vectorized expression.
+    """
+    lat1, lon1 = np.radians(lat1), np.radians(lon1)
+    lat2, lon2 = np.radians(lat2), np.radians(lon2)
 
-    data_to_cache: dict[str, list[dict]] = defaultdict(list)
-    for row in pd.read_csv(CSV_PATH, dtype=str, sep=";", encoding="utf-8").to_dict(
-        orient="records"
-    ):
-        x, y = row["x"], row["y"]
-        try:
-            x = float(x)
-            y = float(y)
-            if math.isnan(x) or math.isnan(y):
-                continue
-        except (ValueError, TypeError):
-            continue
-
-        lon, lat = lambert93_to_wsg84(x, y)
-        coverage = {
-            "2G": bool(int(row["2G"])),
-            "3G": bool(int(row["3G"])),
-            "4G": bool(int(row["4G"])),
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def site_distances_km(
+    query_lat: float,
+    query_lon: float,
+    lat_rad: np.ndarray,
+    lon_rad: np.ndarray,
+    cos_lat: np.ndarray,
+) -> np.ndarray:
+    """
+    Haversine distances from a query point to sites whose radians and cosine
+    columns were precomputed at cache build, leaving only two trig calls on
+    the query point plus element-wise math per request. Query scalars are
+    cast to the dtype of the site columns (float32) so the whole expression
+    stays in single precision.
+    """
+    dtype = lat_rad.dtype
+    query_lat_rad = dtype.type(math.radians(query_lat))
+    query_lon_rad = dtype.type(math.radians(query_lon))
+    query_cos_lat = dtype.type(math.cos(query_lat_rad))
+    half = dtype.type(0.5)
+
+    # a = sin(dlat/2)^2 + cos(query_lat) * cos(lat) * sin(dlon/2)^2, computed
+    # with in-place ufuncs to keep allocations down to the two work buffers
+    a = np.sin((lat_rad - query_lat_rad) * half)
+    np.multiply(a, a, out=a)
+    b = np.sin((lon_rad - query_lon_rad) * half)
+    np.multiply(b, b, out=b)
+    b *= cos_lat
+    b *= query_cos_lat
+    a += b
+
+    np.sqrt(a, out=a)
+    np.arcsin(a, out=a)
+    a *= dtype.type(2 * EARTH_RADIUS_KM)
+    return a
+
+
+def coverage_byte_to_dict(coverage_byte: int) -> dict[str, bool]:
+    """Expand a packed coverage byte back into a 2G/3G/4G flags dict."""
+    return {
+        technology: bool(coverage_byte & bit)
+        for technology, bit in COVERAGE_BIT_BY_TECHNOLOGY.items()
+    }
+
+
+def equirectangular_km(lat, lon):
+    """
+    Project WGS84 degrees onto a local equirectangular plane, in kilometers.
+
+    At France scale the Euclidean distance on this plane is a close enough
+    approximation of the haversine distance to drive a nearest-site lookup.
+    """
+    x = (
+        EARTH_RADIUS_KM
+        * math.cos(math.radians(EQUIRECTANGULAR_REF_LAT))
+        * np.radians(lon)
+    )
+    y = EARTH_RADIUS_KM * np.radians(lat)
+
+    return x, y
+
+
+def grid_cell(x, y) -> tuple[int, int]:
+    """Cell of the spatial hash grid containing projected point (x, y)."""
+    return math.floor(x / GRID_CELL_KM), math.floor(y / GRID_CELL_KM)
+
+
+def _with_site_lookups(
+    data: NetworkCoverageByOperator,
+) -> NetworkCoverageByOperator:
+    """
+    Attach a spatial hash grid mapping each cell to the indices of the
+    operator's sites it contains, plus a bounding box of those sites expanded
+    by MAX_ALLOWED_DISTANCE_KM: any query point outside the box cannot have
+    coverage, so a couple of comparisons are enough to skip the lookup.
+    """
+    lat_margin = MAX_ALLOWED_DISTANCE_KM / KM_PER_DEGREE
+    for arrays in data.values():
+        x, y = equirectangular_km(arrays["lat"], arrays["lon"])
+        cells_x = np.floor(x / GRID_CELL_KM).astype(np.int64)
+        cells_y = np.floor(y / GRID_CELL_KM).astype(np.int64)
+
+        site_indices_by_cell: dict[tuple[int, int], list[int]] = defaultdict(list)
+        for site_idx, cell in enumerate(zip(cells_x.tolist(), cells_y.tolist())):
+            site_indices_by_cell[cell].append(site_idx)
+        arrays["grid"] = {
+            cell: np.asarray(site_indices, dtype=np.int64)
+            for cell, site_indices in site_indices_by_cell.items()
         }
 
-        data_to_cache[row["Operateur"]].append(
-            {
-                "csv_coords_lambert93": {"lon": x, "lat": y},
-                "csv_coords_gps": {"lon": lon, "lat": lat},
-                "coverage": coverage,
+        lat_min = float(arrays["lat"].min()) - lat_margin
+        lat_max = float(arrays["lat"].max()) + lat_margin
+        # Degrees of longitude shrink with latitude, widen accordingly
+        lon_margin = lat_margin / math.cos(
+            math.radians(max(abs(lat_min), abs(lat_max)))
+        )
+        arrays["bbox"] = (
+            lat_min,
+            lat_max,
+            float(arrays["lon"].min()) - lon_margin,
+            float(arrays["lon"].max()) + lon_margin,
+        )
+
+    return data
+
+
+# Columns persisted in the cache directory next to the operators column
+_CACHE_COLUMNS = ("lat", "lon", "lat_rad", "lon_rad", "cos_lat", "coverage")
+
+
+def _cache_column_path(column_name: str) -> str:
+    return os.path.join(CACHE_DIR_PATH, f"{column_name}.npy")
+
+
+def _group_by_operator(
+    operators: np.ndarray, columns: dict[str, np.ndarray]
+) -> NetworkCoverageByOperator:
+    """
+    Slice the flat columnar arrays into one contiguous block per operator,
+    keeping only the operator codes declared in OPERATOR_NAME_BY_CODE so the
+    endpoint never has to validate codes per request.
+
+    Columns are expected sorted by operator code (cache files are written
+    that way), so each block is a plain slice — a view sharing the memory of
+    the underlying arrays, including memory-mapped ones.
+    """
+    if np.any(operators[:-1] > operators[1:]):
+        # Stale cache written before the sorted layout: reorder in memory
+        order = np.argsort(operators, kind="stable")
+        operators = operators[order]
+        columns = {
+            column_name: column[order] for column_name, column in columns.items()
+        }
+
+    operator_codes = np.unique(operators)
+    starts = np.searchsorted(operators, operator_codes, side="left")
+    ends = np.searchsorted(operators, operator_codes, side="right")
+
+    unknown = ~np.isin(operator_codes, OPERATOR_CODES)
+    if unknown.any():
+        logger.warning(
+            "Dropping %d site(s) with operator codes outside %s",
+            int((ends - starts)[unknown].sum()),
+            sorted(OPERATOR_CODES),
+        )
+
+    return _with_site_lookups(
+        {
+            int(operator_code): {
+                column_name: column[start:end]
+                for column_name, column in columns.items()
             }
+            for operator_code, start, end in zip(operator_codes, starts, ends)
+            if int(operator_code) in OPERATOR_ID_BY_CODE
+        }
+    )
+
+
+# Loaded once per process, the parsed cache is reused by every request
+_network_coverage_by_operator: NetworkCoverageByOperator | None = None
+
+
+def load_operator_to_network_coverage_cache() -> NetworkCoverageByOperator:
+    """
+    Map each operator code to NumPy arrays `lat` and `lon` (float64, WGS84
+    degrees), precomputed trig columns `lat_rad`, `lon_rad` and `cos_lat`,
+    `coverage` (uint8, packed 2G/3G/4G bits per site), a spatial hash grid
+    (`grid`) over projected site coordinates and a bounding box (`bbox`) for
+    nearest-site lookups.
+    """
+    global _network_coverage_by_operator
+    if _network_coverage_by_operator is not None:
+        return _network_coverage_by_operator
+
+    # Try loading existing cache files first, memory-mapped read-only
+    if all(
+        os.path.exists(_cache_column_path(column_name))
+        for column_name in ("operators", *_CACHE_COLUMNS)
+    ):
+        _network_coverage_by_operator = _group_by_operator(
+            np.load(_cache_column_path("operators"), mmap_mode="r"),
+            {
+                column_name: np.load(_cache_column_path(column_name), mmap_mode="r")
+                for column_name in _CACHE_COLUMNS
+            },
+        )
+        return _network_coverage_by_operator
+
+    operators: list[int] = []
+    xs: list[float] = []
+    ys: list[float] = []
+    g2: list[int] = []
+    g3: list[int] = []
+    g4: list[int] = []
+    with open(CSV_PATH, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f, delimiter=";")
+        # Resolve column positions once; csv.reader then yields plain lists
+        # instead of building one dict per row like csv.DictReader
+        header = next(reader)
+        operator_col, x_col, y_col, g2_col, g3_col, g4_col = (
+            header.index(column) for column in ("Operateur", "x", "y", "2G", "3G", "4G")
         )
+        for row in reader:
+            try:
+                operator_code = int(row[operator_col])
+                x = float(row[x_col])
+                y = float(row[y_col])
+                if math.isnan(x) or math.isnan(y):
+                    continue
+            except (ValueError, TypeError, IndexError):
+                continue
+
+            operators.append(operator_code)
+            xs.append(x)
+            ys.append(y)
+            g2.append(int(row[g2_col]))
+            g3.append(int(row[g3_col]))
+            g4.append(int(row[g4_col]))
+
+    # Convert all coordinates in a single pyproj call
+    lon, lat = lambert93_to_wsg84(
+        np.asarray(xs, dtype=np.float64), np.asarray(ys, dtype=np.float64)
+    )
+    operators_array = np.asarray(operators, dtype=np.uint32)
+    lat_rad = np.radians(lat)
+    columns: dict[str, np.ndarray] = {
+        "lat": lat,
+        "lon": lon,
+        # Per-site trig precomputed once so requests only pay element-wise
+        # math. float32 is plenty at France scale (~1 m) and doubles the
+        # number of SIMD lanes per instruction compared to float64.
+        "lat_rad": lat_rad.astype(np.float32),
+        "lon_rad": np.radians(lon).astype(np.float32),
+        "cos_lat": np.cos(lat_rad).astype(np.float32),
+        # One byte per site: bit 0 = 2G, bit 1 = 3G, bit 2 = 4G
+        "coverage": (
+            np.asarray(g2, dtype=np.uint8)
+            | (np.asarray(g3, dtype=np.uint8) << 1)
+            | (np.asarray(g4, dtype=np.uint8) << 2)
+        ),
+    }
+
+    # Sort everything by operator code so each operator's sites form one
+    # contiguous block that can be sliced out as a view
+    order = np.argsort(operators_array, kind="stable")
+    operators_array = operators_array[order]
+    columns = {column_name: column[order] for column_name, column in columns.items()}
 
-    # Save cache as JSON file while creating directory if not existing
-    os.makedirs(os.path.dirname(CACHE_FILE_PATH), exist_ok=True)
-    with open(CACHE_FILE_PATH, "w", encoding="utf-8") as f:
-        json.dump(data_to_cache, f)
+    # Save cache as one .npy file per column while creating directory if not
+    # existing
+    os.makedirs(CACHE_DIR_PATH, exist_ok=True)
+    np.save(_cache_column_path("operators"), operators_array)
+    for column_name, column in columns.items():
+        np.save(_cache_column_path(column_name), column)
 
-    return data_to_cache
+    _network_coverage_by_operator = _group_by_operator(operators_array, columns)
+    return _network_coverage_by_operator